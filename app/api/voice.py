@@ -25,7 +25,7 @@ async def incoming_call(request: Request, db: Session = Depends(get_db)):
     call_sid = form_data.get("CallSid")
     from_number = form_data.get("From")
     
-    logger.info(f"Incoming call from {from_number}, SID: {call_sid}")
+    logger.info("Incoming call from %s, SID: %s", from_number, call_sid)
     
     # Normalize phone number
     customer_phone = parse_phone_number(from_number)
@@ -58,7 +58,7 @@ async def handle_language_selection(request: Request, db: Session = Depends(get_
     # Find the conversation record
     conversation = db.query(Conversation).filter(Conversation.call_sid == call_sid).first()
     if not conversation:
-        logger.error(f"Conversation not found for call {call_sid}")
+        logger.error("Conversation not found for call %s", call_sid)
         twiml_response = twilio_service.create_twiml_response(
             "I'm sorry, I'm having trouble with this call. Please try again later."
         )
@@ -109,62 +109,6 @@ async def handle_language_selection(request: Request, db: Session = Depends(get_
     return Response(content=twiml_response, media_type="application/xml")
 
 
-# In app/api/voice.py
-# Make sure you add this route handler
-
-@router.post("/handle-language")
-async def handle_language_selection(request: Request, db: Session = Depends(get_db)):
-    """Handle language selection."""
-    form_data = await request.form()
-    call_sid = form_data.get("CallSid")
-    digits_pressed = form_data.get("Digits")
-    
-    # Find the conversation record
-    conversation = db.query(Conversation).filter(Conversation.call_sid == call_sid).first()
-    if not conversation:
-        logger.error(f"Conversation not found for call {call_sid}")
-        twiml_response = twilio_service.create_twiml_response(
-            "I'm sorry, I'm having trouble with this call. Please try again later."
-        )
-        return Response(content=twiml_response, media_type="application/xml")
-    
-    # Get language based on digits pressed - Default to English for safety
-    language = "en-US"
-    if digits_pressed == "2":
-        language = "en-US"  # Temporarily set to English until we fix Urdu issues
-    
-    # Store language preference in conversation metadata
-    try:
-        conversation_history = json.loads(conversation.conversation_log)
-    except json.JSONDecodeError:
-        conversation_history = []
-    
-    # Add language selection to conversation metadata
-    conversation_history.append({"system": f"Language selected: {language}"})
-    conversation.conversation_log = json.dumps(conversation_history)
-    db.commit()
-    
-    # Check for existing orders for this customer
-    existing_orders = db.query(Order).filter(
-        Order.customer_phone == conversation.customer_phone,
-        Order.status.in_(["confirmed", "modified"])
-    ).order_by(Order.created_at.desc()).first()
-    
-    # Update conversation with order info if available
-    if existing_orders:
-        conversation.order_id = existing_orders.id
-        db.commit()
-    
-    # Get personalized greeting - For now use English regardless of selection
-    if existing_orders:
-        greeting = f"Welcome back to {settings.RESTAURANT_NAME}. I see you have an existing order with us. How can I help you today?"
-    else:
-        greeting = f"Welcome to {settings.RESTAURANT_NAME}. How can I help you today? You can ask about our menu, place an order, or make a reservation."
-    
-    # Create TwiML response - Force English language for now
-    twiml_response = twilio_service.create_twiml_response(greeting, voice_language="en-US")
-    
-    return Response(content=twiml_response, media_type="application/xml")
 # Handle order status checks
 async def handle_order_status_check(conversation, db):
     """Handle order status check intent."""
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
 import logging
 import json
+import asyncio
 from datetime import datetime
 import traceback
 import random
@@ -9,7 +10,7 @@ import copy
 
 from app.db.database import get_db
 from app.db.models import Conversation, ConversationTurn, Order, ErrorLog
-from app.services.twilio_service import twilio_service
+from app.services.twilio_service import twilio_service, ACKNOWLEDGMENT_PHRASES, NO_SPEECH_PROMPT
 from app.services.llm_service import llm_service
 from app.services.rag_service import rag_service
 from app.services.speech_enhancement_service import speech_enhancement_service
@@ -104,18 +105,16 @@ async def speech_webhook(request: Request, db: Session = Depends(get_db)):
         confidence = float(form_data.get("Confidence", 0)) if form_data.get("Confidence") else 0
         
         if not speech_result:
-            logger.warning(f"No speech detected for call {call_sid}")
+            logger.warning("No speech detected for call %s", call_sid)
             return Response(
-                content=twilio_service.create_progressive_response(
-                    "I didn't catch that. Could you please repeat?"
-                ),
+                content=twilio_service.create_progressive_response(NO_SPEECH_PROMPT),
                 media_type="application/xml"
             )
         
         # Get the conversation with caching
         conversation = get_cached_conversation(call_sid, db)
         if not conversation:
-            logger.error(f"Conversation not found for call {call_sid}")
+            logger.error("Conversation not found for call %s", call_sid)
             return Response(
                 content=twilio_service.create_transfer_to_human_response(
                     "I'm having trouble with this call."
@@ -131,8 +130,7 @@ async def speech_webhook(request: Request, db: Session = Depends(get_db)):
             _processing_cache[processing_key] = speech_result
             
             # Send acknowledgment
-            acknowledgments = ["Got it.", "I understand.", "Let me check that."]
-            ack = random.choice(acknowledgments)
+            ack = random.choice(ACKNOWLEDGMENT_PHRASES)
             
             # Return a thinking response immediately
             return Response(
@@ -199,11 +197,8 @@ async def speech_webhook(request: Request, db: Session = Depends(get_db)):
         
         # Handle end_call intent immediately for better responsiveness
         if intent == "end_call":
-            if voice_language == "en-US":
-                response_text = f"Thank you for calling {settings.RESTAURANT_NAME}. Have a wonderful day!"
-            else:
-                response_text = f"{settings.RESTAURANT_NAME} کو کال کرنے کا شکریہ۔ آپ کا دن خوشگوار ہو!"
-                
+            response_text = llm_service.goodbye_message(voice_language)
+            
             # Update conversation with end
             conversation_history.append({"customer": speech_result, "assistant": response_text})
             conversation.conversation_log = json.dumps(conversation_history)
@@ -326,11 +321,24 @@ async def speech_webhook(request: Request, db: Session = Depends(get_db)):
                     media_type="application/xml"
                 )
         
-        # Generate response using LLM
-        ai_response = await llm_service.generate_response(speech_result, conversation_history, order_data)
+        # A new order will need its details parsed, so start that now and overlap it with
+        # response generation instead of running the two calls back to back
+        order_task = None
+        if intent == "new_order" and not conversation.order_id:
+            order_task = asyncio.create_task(
+                llm_service.parse_order_details(speech_result, list(conversation_history))
+            )
         
-        # Enhance with RAG if needed
-        ai_response = await rag_service.enhance_response(speech_result, conversation_history, ai_response)
+        try:
+            # Generate response using LLM
+            ai_response = await llm_service.generate_response(speech_result, conversation_history, order_data)
+            
+            # Enhance with RAG if needed
+            ai_response = await rag_service.enhance_response(speech_result, conversation_history, ai_response)
+        except BaseException:
+            if order_task is not None:
+                order_task.cancel()
+            raise
         
         # Add to conversation history
         conversation_history.append({"customer": speech_result, "assistant": ai_response})
@@ -359,9 +367,9 @@ async def speech_webhook(request: Request, db: Session = Depends(get_db)):
         db.commit()
         
         # Process new orders if intent is new_order
-        if intent == "new_order" and not conversation.order_id:
-            # Parse order details from conversation
-            order_details = await llm_service.parse_order_details(speech_result, conversation_history)
+        if order_task is not None:
+            # Collect the order details parsed alongside the response
+            order_details = await order_task
             
             # Only create order if we have meaningful data
             if order_details.get("order_items") or order_details.get("reservation_time"):
@@ -401,7 +409,7 @@ async def speech_webhook(request: Request, db: Session = Depends(get_db)):
         )
         
     except Exception as e:
-        logger.error(f"Error processing speech: {str(e)}")
+        logger.error("Error processing speech: %s", e)
         
         # Log the error
         try:
@@ -470,7 +478,7 @@ async def no_input_webhook(request: Request, db: Session = Depends(get_db)):
     form_data = await request.form()
     call_sid = form_data.get("CallSid")
     
-    logger.info(f"No input received for call {call_sid}")
+    logger.info("No input received for call %s", call_sid)
     
     # Get fresh conversation from database with caching
     conversation = get_cached_conversation(call_sid, db)
@@ -527,113 +535,6 @@ async def no_input_webhook(request: Request, db: Session = Depends(get_db)):
     ))
     db.commit()
     
-    # Simple, brief prompts for better response time
-    if voice_language == "en-US":
-        if no_input_count == 0:
-            response = "Are you still there?"
-        else:
-            response = "If you're there, please speak now."
-    else:
-        if no_input_count == 0:
-            response = "کیا آپ ابھی بھی وہاں ہیں؟"
-        else:
-            response = "اگر آپ وہاں ہیں تو، براہ کرم اب بولیں۔"
-    
-    return Response(
-        content=twilio_service.create_twiml_response(response, voice_language=voice_language),
-        media_type="application/xml"
-    )
-@router.post("/complete-processing")
-async def complete_processing(request: Request, db: Session = Depends(get_db)):
-    """Continue processing a complex query after sending initial acknowledgment."""
-    form_data = await request.form()
-    call_sid = form_data.get("CallSid")
-    
-    # Get the saved query from the cache
-    processing_key = f"processing_{call_sid}"
-    speech_result = _conversation_cache.get(processing_key)
-    
-    if not speech_result:
-        return Response(
-            content=twilio_service.create_twiml_response(
-                "I'm sorry, I lost track of your question. Could you please repeat?"
-            ),
-            media_type="application/xml"
-        )
-    
-    # Clear from cache
-    _conversation_cache.pop(processing_key, None)
-    
-    # Continue with normal processing (simulate a form with the speech result)
-    mock_request = Request(scope=request.scope)
-    mock_request.form = lambda: {
-        "CallSid": call_sid,
-        "SpeechResult": speech_result,
-        "Confidence": "0.8"
-    }
-    
-    return await speech_webhook(mock_request, db)
-
-@router.post("/no-input")
-async def no_input_webhook(request: Request, db: Session = Depends(get_db)):
-    """Webhook for handling no input from user."""
-    form_data = await request.form()
-    call_sid = form_data.get("CallSid")
-    
-    logger.info(f"No input received for call {call_sid}")
-    
-    # Get cached conversation
-    conversation = get_cached_conversation(call_sid, db)
-    if not conversation:
-        # Fallback if conversation not found
-        return Response(
-            content=twilio_service.create_twiml_response("Can I help you with anything today?"),
-            media_type="application/xml"
-        )
-    
-    # Extract language preference
-    voice_language = "en-US"  # Default to English
-    try:
-        conversation_history = json.loads(conversation.conversation_log)
-        for entry in conversation_history:
-            if "system" in entry and "Language selected:" in entry["system"]:
-                if "ur-PK" in entry["system"]:
-                    voice_language = "ur-PK"
-                break
-    except:
-        conversation_history = []
-    
-    # Fast count query for no-input events
-    no_input_count = db.query(ConversationTurn).filter(
-        ConversationTurn.conversation_id == conversation.id,
-        ConversationTurn.content == "NO_INPUT"
-    ).count()
-    
-    if no_input_count >= 3:
-        # After multiple no-inputs, end the call politely
-        if voice_language == "en-US":
-            goodbye_message = f"I haven't heard a response. Thank you for calling {settings.RESTAURANT_NAME}. Feel free to call back anytime!"
-        else:
-            goodbye_message = f"مجھے کوئی جواب نہیں ملا۔ {settings.RESTAURANT_NAME} کو کال کرنے کا شکریہ۔ کسی بھی وقت دوبارہ کال کرنے میں آزاد ہیں!"
-            
-        # Update conversation record with end time
-        conversation.ended_at = datetime.utcnow()
-        db.commit()
-        
-        return Response(
-            content=twilio_service.create_goodbye_response(goodbye_message, voice_language),
-            media_type="application/xml"
-        )
-    
-    # Add a no-input marker efficiently
-    db.add(ConversationTurn(
-        conversation_id=conversation.id,
-        sequence=len(conversation_history) + 1 if conversation_history else 1,
-        speaker="customer",
-        content="NO_INPUT"
-    ))
-    db.commit()
-    
     # Simple, brief prompts for better response time
     if voice_language == "en-US":
         if no_input_count == 0:
@@ -657,7 +558,7 @@ async def speech_fallback(request: Request, db: Session = Depends(get_db)):
     form_data = await request.form()
     call_sid = form_data.get("CallSid")
     
-    logger.info(f"Speech recognition fallback for call {call_sid}")
+    logger.info("Speech recognition fallback for call %s", call_sid)
     
     # Find the conversation record
     conversation = get_cached_conversation(call_sid, db)
@@ -732,12 +633,12 @@ async def call_status_webhook(request: Request, db: Session = Depends(get_db)):
         call_status = form_data.get("CallStatus")
         call_duration = form_data.get("CallDuration")
         
-        logger.info(f"Call status update - SID: {call_sid}, Status: {call_status}, Duration: {call_duration}")
+        logger.info("Call status update - SID: %s, Status: %s, Duration: %s", call_sid, call_status, call_duration)
         
         # Find the conversation record
         conversation = get_cached_conversation(call_sid, db)
         if not conversation:
-            logger.warning(f"Conversation not found for call {call_sid}")
+            logger.warning("Conversation not found for call %s", call_sid)
             return {"status": "warning", "message": "Conversation not found"}
         
         # Update the conversation based on call status
@@ -752,16 +653,16 @@ async def call_status_webhook(request: Request, db: Session = Depends(get_db)):
                 if len(conversation_history) > 1:
                     sentiment_score = await llm_service.analyze_sentiment(conversation_history)
                     conversation.sentiment_score = sentiment_score
-                    logger.info(f"Call sentiment score: {sentiment_score}")
+                    logger.info("Call sentiment score: %s", sentiment_score)
             except Exception as e:
-                logger.error(f"Error analyzing sentiment: {str(e)}")
+                logger.error("Error analyzing sentiment: %s", e)
             
             db.commit()
             
         return {"status": "success"}
         
     except Exception as e:
-        logger.error(f"Error processing call status webhook: {str(e)}")
+        logger.error("Error processing call status webhook: %s", e)
         
         # Log the error
         try:
@@ -789,7 +690,7 @@ async def fallback_webhook(request: Request, db: Session = Depends(get_db)):
         error_code = form_data.get("ErrorCode")
         error_message = form_data.get("ErrorMessage")
         
-        logger.error(f"Fallback triggered - SID: {call_sid}, Error: {error_type} ({error_code}): {error_message}")
+        logger.error("Fallback triggered - SID: %s, Error: %s (%s): %s", call_sid, error_type, error_code, error_message)
         
         # Log the error
         error_log = ErrorLog(
@@ -840,7 +741,7 @@ async def fallback_webhook(request: Request, db: Session = Depends(get_db)):
         )
         
     except Exception as e:
-        logger.error(f"Error in fallback webhook: {str(e)}")
+        logger.error("Error in fallback webhook: %s", e)
         
         # Create a basic TwiML response as a last resort
         response = """
@@ -51,6 +51,19 @@ class Settings(BaseSettings):
     # Database Configuration
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./restaurant_voice_agent.db")
     
+    # Cache Configuration (Redis is optional; leave REDIS_URL empty to use in-process caches only)
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
+    CACHE_TTL: int = parse_int_env("CACHE_TTL", 86400)
+    REDIS_TIMEOUT_MS: int = parse_int_env("REDIS_TIMEOUT_MS", 100)
+    QUANTIZE_EMBEDDINGS: bool = os.getenv("QUANTIZE_EMBEDDINGS", "false").lower() == "true"
+    # Minimum cosine similarity for vector-search results to be used as menu knowledge; tuned
+    # for text-embedding-3-small at 512 dimensions, which scores lower than ada-002 did
+    RAG_SIMILARITY_THRESHOLD: float = float(os.getenv("RAG_SIMILARITY_THRESHOLD", "0.4"))
+    EMBEDDING_CACHE_DIR: str = os.getenv(
+        "EMBEDDING_CACHE_DIR",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "embeddings")
+    )
+    
     # Application Settings
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
@@ -58,6 +71,7 @@ class Settings(BaseSettings):
     DEFAULT_MODEL: str = os.getenv("DEFAULT_MODEL", "gpt-3.5-turbo")
     CONVERSATION_MODEL: str = os.getenv("CONVERSATION_MODEL", "gpt-4")
     RESPONSE_TIMEOUT: int = parse_int_env("RESPONSE_TIMEOUT", 5)
+    HISTORY_TOKEN_BUDGET: int = parse_int_env("HISTORY_TOKEN_BUDGET", 800)
     
     # Restaurant Configuration
     RESTAURANT_NAME: str = os.getenv("RESTAURANT_NAME", "Mario's Italian Restaurant")
@@ -66,6 +80,9 @@ class Settings(BaseSettings):
     DELIVERY_FEE: int = parse_int_env("DELIVERY_FEE", 3)
     MIN_RESERVATION_SIZE: int = parse_int_env("MIN_RESERVATION_SIZE", 5)
     
+    GOODBYE_MESSAGE: str = "Thank you for calling {restaurant_name}. Have a wonderful day!"
+    GOODBYE_MESSAGE_URDU: str = "{restaurant_name} کو کال کرنے کا شکریہ۔ آپ کا دن خوشگوار ہو!"
+    
     # Optional Monitoring
     SENTRY_DSN: Optional[str] = os.getenv("SENTRY_DSN", "")
     
@@ -156,6 +173,10 @@ settings.CONVERSATION_SYSTEM_PROMPT = settings.CONVERSATION_SYSTEM_PROMPT.format
     min_reservation_size=settings.MIN_RESERVATION_SIZE
 )
 
+# Format the goodbye message with the restaurant name
+settings.GOODBYE_MESSAGE = settings.GOODBYE_MESSAGE.format(restaurant_name=settings.RESTAURANT_NAME)
+settings.GOODBYE_MESSAGE_URDU = settings.GOODBYE_MESSAGE_URDU.format(restaurant_name=settings.RESTAURANT_NAME)
+
 # Format the Urdu system prompt with restaurant details
 settings.CONVERSATION_SYSTEM_PROMPT_URDU = settings.CONVERSATION_SYSTEM_PROMPT_URDU.format(
     restaurant_name=settings.RESTAURANT_NAME,
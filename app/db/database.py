@@ -29,7 +29,7 @@ def get_db():
         yield db
     except Exception as e:
         db.rollback()
-        logger.error(f"Database error: {str(e)}")
+        logger.error("Database error: %s", e)
         raise
     finally:
         db.close()
@@ -43,7 +43,7 @@ def get_db_context():
         yield db
     except Exception as e:
         db.rollback()
-        logger.error(f"Database error: {str(e)}")
+        logger.error("Database error: %s", e)
         raise
     finally:
         db.close()
@@ -1,5 +1,6 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 import logging
 import time
 import sentry_sdk
@@ -7,6 +8,9 @@ from prometheus_client import Counter, Histogram
 from prometheus_client import make_asgi_app
 
 from app.api import voice, webhook, admin
+from app.services.llm_service import llm_service
+from app.services.http_client import http_client
+from app.services.vector_store import init_vector_store
 from app.db.database import engine, Base
 from app.utils.logger import setup_logging
 from app.config import settings
@@ -25,11 +29,24 @@ logger = setup_logging()
 # Create tables in the database
 Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Build the knowledge index and load the tokenizer on startup, and release shared
+    outbound connections on shutdown.
+    """
+    await init_vector_store()
+    await llm_service.load_tokenizer()
+    yield
+    await llm_service.close()
+    await http_client.aclose()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Restaurant AI Voice Agent",
     description="AI-powered voice agent for restaurant orders and reservations",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -0,0 +1,9 @@
+import httpx
+
+# Process-wide HTTP/2 connection pool shared by all outbound async API clients,
+# so concurrent calls multiplex over kept-alive connections
+http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    timeout=httpx.Timeout(15.0, connect=2.0)
+)
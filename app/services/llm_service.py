@@ -1,18 +1,54 @@
 import openai
+import tiktoken
+import redis.asyncio as redis
 import json
+import hashlib
 import logging
 import random
 from tenacity import retry, stop_after_attempt, wait_exponential
 import time
 import asyncio
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Awaitable
 
 from app.config import settings
+from app.services.http_client import http_client
 
 logger = logging.getLogger(__name__)
 
-# Create an OpenAI client with explicit API key
-client = openai.Client(api_key=settings.OPENAI_API_KEY)
+# Create an async OpenAI client with explicit API key
+client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY, http_client=http_client)
+
+# Function-calling schema for structured order extraction
+ORDER_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "submit_order",
+        "description": "Submit the order details extracted from the conversation.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "customer_name": {"type": ["string", "null"]},
+                "order_items": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "item": {"type": "string"},
+                            "quantity": {"type": "integer"},
+                            "special_instructions": {"type": ["string", "null"]}
+                        },
+                        "required": ["item", "quantity"]
+                    }
+                },
+                "is_delivery": {"type": "boolean"},
+                "address": {"type": ["string", "null"]},
+                "reservation_time": {"type": ["string", "null"]},
+                "party_size": {"type": ["integer", "null"]}
+            },
+            "required": ["customer_name", "order_items", "is_delivery", "address", "reservation_time", "party_size"]
+        }
+    }
+}
 
 class LLMService:
     def __init__(self):
@@ -20,22 +56,148 @@ class LLMService:
         # Use faster models for intent classification and simple responses
         self.default_model = "gpt-3.5-turbo"  # Fast model for intents and basic responses
         self.conversation_model = "gpt-3.5-turbo"  # Use this instead of gpt-4 for faster responses
-        # Only use gpt-4 for complex order understanding
-        self.order_model = "gpt-4"  # Keep the more advanced model just for order parsing
+        # Small model with a function-calling schema is enough for structured order extraction
+        self.order_model = "gpt-4o-mini"
         self.intent_system_prompt = settings.INTENT_SYSTEM_PROMPT
         self.conversation_system_prompt = settings.CONVERSATION_SYSTEM_PROMPT
         self.order_parser_system_prompt = settings.ORDER_PARSER_SYSTEM_PROMPT
         self.client = client  # Expose the client for use by other services
         
+        # Tokenizer for budgeting conversation history sent to the model; loaded off the event
+        # loop by load_tokenizer() at startup, since tiktoken may need to download it
+        self._encoding = None
+        self.history_token_budget = settings.HISTORY_TOKEN_BUDGET
+        
         # Add response cache
         self.response_cache = {}
         self.intent_cache = {}
         
+        # Optional Redis cache shared across workers; the local dicts act as L1 in front of it.
+        # Short socket timeouts so an unreachable Redis costs one brief wait, then a miss
+        self._redis = None
+        if settings.REDIS_URL:
+            redis_timeout = settings.REDIS_TIMEOUT_MS / 1000
+            self._redis = redis.from_url(
+                settings.REDIS_URL,
+                decode_responses=True,
+                socket_timeout=redis_timeout,
+                socket_connect_timeout=redis_timeout
+            )
+        self.cache_ttl = settings.CACHE_TTL
+        
+        # In-flight API calls, so concurrent identical queries share one request
+        self._inflight: Dict[str, asyncio.Future] = {}
+        
         # Log model usage for debugging
-        logger.info(f"Using models - default: {self.default_model}, conversation: {self.conversation_model}, order: {self.order_model}")
+        logger.info("Using models - default: %s, conversation: %s, order: %s", self.default_model, self.conversation_model, self.order_model)
+    
+    def _keyword_intent(self, cache_key: str) -> Optional[str]:
+        """Classify common intents based on simple keyword matching."""
+        if any(word in cache_key for word in ['bye', 'goodbye', 'thank', 'hang up', 'end']):
+            return "end_call"
+        
+        if any(word in cache_key for word in ['order', 'pizza', 'food', 'menu']):
+            return "new_order"
+            
+        if any(word in cache_key for word in ['reserve', 'reservation', 'book', 'table']):
+            return "reservation"
+        
+        return None
+    
+    def _load_encoding(self) -> None:
+        """Load the tiktoken encoding (blocking; may download it on a cold cache)."""
+        try:
+            self._encoding = tiktoken.encoding_for_model(self.conversation_model)
+        except Exception as e:
+            logger.warning("Tokenizer unavailable, estimating token counts: %s", e)
+    
+    async def load_tokenizer(self, timeout: float = 10.0) -> None:
+        """Load the tokenizer in a worker thread without holding up startup for long."""
+        if self._encoding is not None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.to_thread(self._load_encoding), timeout)
+        except asyncio.TimeoutError:
+            # The thread keeps going and sets the encoding if the download finishes later
+            logger.warning("Tokenizer still loading after %ss, estimating token counts meanwhile", timeout)
+    
+    def _count_tokens(self, text: str) -> int:
+        """Count tokens with tiktoken, or estimate ~4 characters per token until it is loaded."""
+        if self._encoding is None:
+            return len(text) // 4
+        return len(self._encoding.encode(text))
+    
+    def _trim_history(self, conversation_history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Keep the most recent turns that fit within the history token budget."""
+        used = 0
+        start = len(conversation_history)
+        for exchange in reversed(conversation_history):
+            used += self._count_tokens(exchange.get("customer") or "")
+            used += self._count_tokens(exchange.get("assistant") or "")
+            if used > self.history_token_budget:
+                break
+            start -= 1
+        return conversation_history[start:]
+    
+    def _context_hash(self, conversation_history: List[Dict[str, str]], order_data: Optional[Dict[str, Any]]) -> str:
+        """Short digest of the context a response was generated from."""
+        context = json.dumps([conversation_history or [], order_data or {}], sort_keys=True, default=str)
+        return hashlib.sha256(context.encode()).hexdigest()[:16]
+    
+    async def _shared_cache_get(self, key: str) -> Optional[str]:
+        """Look up a cached value in Redis, if configured."""
+        if self._redis is None:
+            return None
+        try:
+            return await self._redis.get(key)
+        except Exception as e:
+            logger.warning("Redis cache read failed: %s", e)
+            return None
+    
+    async def _shared_cache_set(self, key: str, value: str) -> None:
+        """Store a value in Redis, if configured."""
+        if self._redis is None:
+            return
+        try:
+            await self._redis.set(key, value, ex=self.cache_ttl)
+        except Exception as e:
+            logger.warning("Redis cache write failed: %s", e)
+    
+    async def close(self) -> None:
+        """Close the shared cache connection."""
+        if self._redis is not None:
+            await self._redis.aclose()
+    
+    async def _coalesce(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Await an in-flight call for the same key, or start one and share its result."""
+        task = self._inflight.get(key)
+        if task is None:
+            # Run the call detached from any one caller, so cancelling a caller only
+            # stops its own wait and never the result the others are waiting on
+            task = asyncio.ensure_future(call())
+            self._inflight[key] = task
+            
+            def _done(finished: asyncio.Future) -> None:
+                if self._inflight.get(key) is finished:
+                    del self._inflight[key]
+                if not finished.cancelled():
+                    finished.exception()  # Mark as retrieved in case every waiter was cancelled
+            
+            task.add_done_callback(_done)
+        return await asyncio.shield(task)
+    
+    def goodbye_message(self, voice_language: str = "en-US") -> str:
+        """The fixed goodbye spoken when a call ends, in the caller's language."""
+        if voice_language == "ur-PK":
+            return settings.GOODBYE_MESSAGE_URDU
+        return settings.GOODBYE_MESSAGE
     
-    async def process_in_parallel(self, speech_result, conversation_history, order_data):
+    async def process_in_parallel(self, speech_result, conversation_history, order_data, voice_language="en-US"):
         """Process intent and response in parallel for faster results."""
+        # End of call needs a fixed goodbye, not an LLM response
+        if self._keyword_intent(speech_result.lower().strip()) == "end_call":
+            return "end_call", self.goodbye_message(voice_language)
+        
         # Start both operations concurrently
         intent_task = asyncio.create_task(
             self.classify_intent(speech_result)
@@ -44,10 +206,14 @@ class LLMService:
             self.generate_response(speech_result, conversation_history, order_data)
         )
         
-        # Wait for both to complete
-        intent, response = await asyncio.gather(intent_task, response_task)
-        
-        return intent, response
+        # Wait for both to complete; if either fails (or we are cancelled), don't leave
+        # the other running unobserved
+        try:
+            return await intent_task, await response_task
+        except BaseException:
+            intent_task.cancel()
+            response_task.cancel()
+            raise
     
     @retry(
         stop=stop_after_attempt(3),
@@ -70,23 +236,28 @@ class LLMService:
             return self.intent_cache[cache_key]
         
         # Check for common intents based on simple keyword matching
-        if any(word in cache_key for word in ['bye', 'goodbye', 'thank', 'hang up', 'end']):
-            self.intent_cache[cache_key] = "end_call"
-            return "end_call"
+        intent = self._keyword_intent(cache_key)
+        if intent:
+            self.intent_cache[cache_key] = intent
+            return intent
         
-        if any(word in cache_key for word in ['order', 'pizza', 'food', 'menu']):
-            self.intent_cache[cache_key] = "new_order"
-            return "new_order"
-            
-        if any(word in cache_key for word in ['reserve', 'reservation', 'book', 'table']):
-            self.intent_cache[cache_key] = "reservation"
-            return "reservation"
+        # Check the cache shared with other workers
+        intent = await self._shared_cache_get(f"intent:{cache_key}")
+        if intent:
+            self.intent_cache[cache_key] = intent
+            return intent
         
-        start_time = time.time()
+        # Share a single API call between concurrent identical queries
+        return await self._coalesce(
+            f"intent:{cache_key}", lambda: self._request_intent(transcript, cache_key)
+        )
+    
+    async def _request_intent(self, transcript: str, cache_key: str) -> str:
+        """Classify intent with the LLM and cache the result."""
+        start_time = time.perf_counter() if logger.isEnabledFor(logging.DEBUG) else None
         
         try:
-            # Use the synchronous client since we're in an async function
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=self.default_model,
                 messages=[
                     {"role": "system", "content": self.intent_system_prompt},
@@ -97,16 +268,17 @@ class LLMService:
             )
             
             intent = response.choices[0].message.content.strip().lower()
-            processing_time = time.time() - start_time
-            logger.debug(f"Intent classification completed in {processing_time:.2f}s: {intent}")
+            if start_time is not None:
+                logger.debug("Intent classification completed in %.2fs: %s", time.perf_counter() - start_time, intent)
             
             # Cache the intent for future use
             self.intent_cache[cache_key] = intent
+            await self._shared_cache_set(f"intent:{cache_key}", intent)
             
             return intent
         
         except Exception as e:
-            logger.error(f"Intent classification failed: {str(e)}")
+            logger.error("Intent classification failed: %s", e)
             # Default to unclear if we can't classify
             return "unclear"
     
@@ -132,26 +304,50 @@ class LLMService:
         Returns:
             str: The generated response
         """
-        # Check cache first for common queries
         cache_key = transcript.lower().strip()
-        if cache_key in self.response_cache:
-            return self.response_cache[cache_key]
             
         # Check for common questions and provide instant responses
         for key, response in settings.COMMON_RESPONSES.items():
             if key in cache_key:
-                self.response_cache[cache_key] = response
                 return response
         
-        start_time = time.time()
+        # Only simple queries are cacheable, so only those can share an in-flight call
+        if len(transcript.split()) < 8:
+            # Responses depend on the caller's history and order, so both the local and
+            # the shared cache are keyed on a hash of that context as well as the transcript
+            shared_key = f"response:{self._context_hash(conversation_history, order_data)}:{cache_key}"
+            if shared_key in self.response_cache:
+                return self.response_cache[shared_key]
+            
+            # Check the cache shared with other workers
+            cached = await self._shared_cache_get(shared_key)
+            if cached:
+                self.response_cache[shared_key] = cached
+                return cached
+            
+            return await self._coalesce(
+                shared_key,
+                lambda: self._request_response(transcript, conversation_history, order_data, shared_key)
+            )
+        return await self._request_response(transcript, conversation_history, order_data)
+    
+    async def _request_response(
+        self,
+        transcript: str,
+        conversation_history: List[Dict[str, str]],
+        order_data: Optional[Dict[str, Any]],
+        shared_key: Optional[str] = None
+    ) -> str:
+        """Generate a response with the LLM and cache it for simple queries."""
+        start_time = time.perf_counter() if logger.isEnabledFor(logging.DEBUG) else None
         
         # Prepare messages including conversation history
         messages = [
             {"role": "system", "content": self.conversation_system_prompt}
         ]
         
-        # Limit conversation history to last 5 exchanges to reduce token usage
-        recent_history = conversation_history[-5:] if len(conversation_history) > 5 else conversation_history
+        # Limit conversation history to a token budget to reduce prompt size
+        recent_history = self._trim_history(conversation_history)
         
         # Add conversation history
         for exchange in recent_history:
@@ -169,8 +365,7 @@ class LLMService:
             messages.append({"role": "system", "content": order_context})
         
         try:
-            # Use the synchronous client
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=self.conversation_model,
                 messages=messages,
                 max_tokens=100,  # Reduced token length for faster response
@@ -178,12 +373,13 @@ class LLMService:
             )
             
             ai_response = response.choices[0].message.content
-            processing_time = time.time() - start_time
-            logger.debug(f"Response generation completed in {processing_time:.2f}s")
+            if start_time is not None:
+                logger.debug("Response generation completed in %.2fs", time.perf_counter() - start_time)
             
-            # Cache the response for future use (only for simple queries)
-            if len(transcript.split()) < 8:  # Cache only simple queries
-                self.response_cache[cache_key] = ai_response
+            # Cache the response for future use (only simple queries get a shared key)
+            if shared_key is not None:
+                self.response_cache[shared_key] = ai_response
+                await self._shared_cache_set(shared_key, ai_response)
             
             return ai_response
         
@@ -192,7 +388,7 @@ class LLMService:
             return "I'm sorry, I'm having trouble processing your request. Let me transfer you to a staff member who can help."
         
         except Exception as e:
-            logger.error(f"Response generation failed: {str(e)}")
+            logger.error("Response generation failed: %s", e)
             return "I apologize, but I'm experiencing some technical difficulties. Let me transfer you to one of our staff members."
     
     @retry(
@@ -211,7 +407,7 @@ class LLMService:
         Returns:
             Dict: Extracted order details
         """
-        start_time = time.time()
+        start_time = time.perf_counter() if logger.isEnabledFor(logging.DEBUG) else None
         
         # Prepare the full conversation
         full_conversation = ""
@@ -224,21 +420,22 @@ class LLMService:
         full_conversation += f"Customer: {transcript}"
         
         try:
-            # Use the advanced model for order parsing
-            response = client.chat.completions.create(
+            # Force the submit_order function call so the arguments follow the schema
+            response = await client.chat.completions.create(
                 model=self.order_model,
                 messages=[
                     {"role": "system", "content": self.order_parser_system_prompt},
                     {"role": "user", "content": full_conversation}
                 ],
-                response_format={"type": "json_object"},
+                tools=[ORDER_TOOL],
+                tool_choice={"type": "function", "function": {"name": "submit_order"}},
                 max_tokens=500,
                 temperature=0.2
             )
             
-            order_details = json.loads(response.choices[0].message.content)
-            processing_time = time.time() - start_time
-            logger.debug(f"Order parsing completed in {processing_time:.2f}s")
+            order_details = json.loads(response.choices[0].message.tool_calls[0].function.arguments)
+            if start_time is not None:
+                logger.debug("Order parsing completed in %.2fs", time.perf_counter() - start_time)
             
             return order_details
             
@@ -256,7 +453,7 @@ class LLMService:
             }
             
         except Exception as e:
-            logger.error(f"Order parsing failed: {str(e)}")
+            logger.error("Order parsing failed: %s", e)
             return {
                 "customer_name": None,
                 "order_items": [],
@@ -296,7 +493,7 @@ class LLMService:
         """
         
         try:
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=self.default_model,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -311,11 +508,11 @@ class LLMService:
                 sentiment_score = float(sentiment_text)
                 return max(-1.0, min(1.0, sentiment_score))  # Clamp to [-1, 1]
             except ValueError:
-                logger.error(f"Failed to parse sentiment score: {sentiment_text}")
+                logger.error("Failed to parse sentiment score: %s", sentiment_text)
                 return 0.0
                 
         except Exception as e:
-            logger.error(f"Sentiment analysis failed: {str(e)}")
+            logger.error("Sentiment analysis failed: %s", e)
             return 0.0  # Default to neutral
             
 # Create a singleton instance
@@ -3,19 +3,28 @@ import json
 from typing import List, Dict, Any, Optional
 import re
 
-from app.services.vector_store import vector_store
+from app.config import settings
+from app.services.vector_store import get_vector_store
 from app.services.llm_service import llm_service
 
 logger = logging.getLogger(__name__)
 
+# Regular expressions for key menu and policy terms
+_MENU_RE = re.compile(r'(?:pizza|pasta|linguine|fettuccine|tiramisu|lasagna|margherita|seafood|dessert|appetizer|salad|bread)')
+_POLICY_RE = re.compile(r'(?:delivery|pickup|reservation|allergies|dietary|gluten|vegetarian|vegan|hours|payment|cancel|minimum order)')
+
 class RAGService:
     """RAG (Retrieval-Augmented Generation) service for enhancing responses with knowledge base."""
     
     def __init__(self):
         """Initialize the RAG service."""
-        self.vector_store = vector_store
         self.llm_service = llm_service
     
+    @property
+    def vector_store(self):
+        """The shared vector store, built lazily so importing this module stays cheap."""
+        return get_vector_store()
+    
     async def enhance_response(self, query: str, conversation_history: List[Dict[str, str]], 
                             llm_response: str) -> str:
         """
@@ -37,7 +46,7 @@ class RAGService:
         
         # If menu items are mentioned, enrich with specific details
         if menu_items:
-            knowledge_context = self._get_menu_item_details(menu_items)
+            knowledge_context = await self._get_menu_item_details(menu_items)
             if knowledge_context:
                 enriched_response = await self._rewrite_with_knowledge(
                     query, conversation_history, llm_response, knowledge_context
@@ -68,11 +77,8 @@ class RAGService:
         """Extract potential menu items or categories from text."""
         combined_text = (query + " " + response).lower()
         
-        # Define regular expressions for key menu terms
-        menu_item_pattern = r'(?:pizza|pasta|linguine|fettuccine|tiramisu|lasagna|margherita|seafood|dessert|appetizer|salad|bread)'
-        
         # Find all matches
-        matches = re.findall(menu_item_pattern, combined_text)
+        matches = _MENU_RE.findall(combined_text)
         
         # Deduplicate and return
         return list(set(matches))
@@ -81,11 +87,8 @@ class RAGService:
         """Extract potential policy topics from text."""
         combined_text = (query + " " + response).lower()
         
-        # Define regular expressions for key policy terms
-        policy_pattern = r'(?:delivery|pickup|reservation|allergies|dietary|gluten|vegetarian|vegan|hours|payment|cancel|minimum order)'
-        
         # Find all matches
-        matches = re.findall(policy_pattern, combined_text)
+        matches = _POLICY_RE.findall(combined_text)
         
         # Map to our known policy topics
         policy_mapping = {
@@ -107,7 +110,7 @@ class RAGService:
         
         return list(set(policy_topics))
     
-    def _get_menu_item_details(self, menu_items: List[str]) -> str:
+    async def _get_menu_item_details(self, menu_items: List[str]) -> str:
         """Get details about menu items from the knowledge base."""
         knowledge_chunks = []
         
@@ -126,9 +129,9 @@ class RAGService:
                 continue
                 
             # If not exact match, search by relevance
-            results = self.vector_store.search(item, top_k=2)
+            results = await self.vector_store.search(item, top_k=2)
             for result in results:
-                if result['similarity'] > 0.75:  # Only use if reasonably relevant
+                if result['similarity'] > settings.RAG_SIMILARITY_THRESHOLD:  # Only use if reasonably relevant
                     knowledge_chunks.append(result['text'])
         
         # Return combined knowledge context
@@ -191,8 +194,8 @@ class RAGService:
                 {"role": "user", "content": "Please rewrite your response to be more accurate using the information provided in the system prompt."}
             ]
             
-            # Get rewritten response - Remove the await keyword
-            response = self.llm_service.client.chat.completions.create(
+            # Get rewritten response
+            response = await self.llm_service.client.chat.completions.create(
                 model=self.llm_service.conversation_model,
                 messages=messages,
                 max_tokens=250,
@@ -201,11 +204,11 @@ class RAGService:
             
             rewritten_response = response.choices[0].message.content
             
-            logger.debug(f"Rewrote response using knowledge context")
+            logger.debug("Rewrote response using knowledge context")
             return rewritten_response
             
         except Exception as e:
-            logger.error(f"Error rewriting with knowledge: {str(e)}")
+            logger.error("Error rewriting with knowledge: %s", e)
             # Fall back to original response if rewriting fails
             return original_response
 
@@ -6,6 +6,10 @@ from typing import Dict, List, Optional, Any
 
 logger = logging.getLogger(__name__)
 
+# Precompiled patterns used on every response
+_SENT_SPLIT = re.compile(r'(?<=[.!?])\s+')
+_PAUSE = re.compile(r'\.(?=\s+[A-Z])')
+
 class SpeechEnhancementService:
     """Service for making AI speech more human-like."""
     
@@ -31,18 +35,21 @@ class SpeechEnhancementService:
             return text
         
         # Split text into sentences
-        sentences = re.split(r'(?<=[.!?])\s+', text)
+        sentences = _SENT_SPLIT.split(text)
         
         # Insert filler at 1-2 random positions for longer responses
         if len(sentences) > 2:
             # Pick 1-2 random positions for insertion
             num_fillers = min(2, len(sentences) - 1)
-            positions = random.sample(range(1, len(sentences)), num_fillers)
+            positions = set(random.sample(range(1, len(sentences)), num_fillers))
             
-            # Insert fillers at chosen positions
-            for pos in sorted(positions, reverse=True):
-                filler = random.choice(fillers)
-                sentences.insert(pos, filler)
+            # Emit fillers before the chosen sentences in a single pass
+            out = []
+            for i, sentence in enumerate(sentences):
+                if i in positions:
+                    out.append(random.choice(fillers))
+                out.append(sentence)
+            sentences = out
         
         # Rejoin text
         return " ".join(sentences)
@@ -50,7 +57,7 @@ class SpeechEnhancementService:
     def add_thinking_pauses(self, text: str) -> str:
         """Add natural thinking pauses to text."""
         # Simply add a pause after sentences instead of using SSML
-        text = re.sub(r'\.(?=\s+[A-Z])', '. ', text)
+        text = _PAUSE.sub('. ', text)
         return text
     
     def cache_response(self, query: str, response: str) -> None:
@@ -1,16 +1,205 @@
 from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
 from twilio.twiml.voice_response import VoiceResponse, Gather
 from tenacity import retry, stop_after_attempt, wait_exponential
 import logging
 import random
+import re
+import asyncio
+from functools import lru_cache
+from xml.sax.saxutils import escape
+from requests.adapters import HTTPAdapter
 
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Splits after sentence-ending punctuation, keeping the punctuation
+_SENT_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+# Polly voice per language; Aditi is an Indian voice, the closest available to Urdu
+DEFAULT_VOICE = 'Polly.Joanna-Neural'
+VOICE_BY_LANG = {
+    "en-US": DEFAULT_VOICE,
+    "ur-PK": 'Polly.Aditi-Neural'
+}
+
+# Message spoken before transferring to a human, per language
+TRANSFER_MSG_BY_LANG = {
+    "en-US": "Transferring you to one of our staff. Please hold.",
+    "ur-PK": "آپ کو ہمارے عملے کے ایک رکن سے منسلک کیا جا رہا ہے۔ براہ کرم انتظار کریں۔"
+}
+
+# Phrases used to bridge processing time, per language
+THINKING_PHRASES_BY_LANG = {
+    "en-US": (
+        "Let me check that for you.",
+        "Just a moment.",
+        "Looking that up now."
+    ),
+    "ur-PK": (
+        "میں آپ کے لیے چیک کر رہا ہوں۔",
+        "بس ایک لمحے۔",
+        "ابھی دیکھ رہا ہوں۔"
+    )
+}
+
+def _voice_for(voice_language):
+    """Select the voice for a language."""
+    return VOICE_BY_LANG.get(voice_language, DEFAULT_VOICE)
+
+# TwiML for fixed prompts is identical for the same inputs, so the builders are memoized
+
+@lru_cache(maxsize=256)
+def _language_selection_twiml(message):
+    """Build the language selection TwiML."""
+    response = VoiceResponse()
+    
+    # Add the language selection prompt
+    response.say(message, voice=DEFAULT_VOICE, language="en-US", volume="loud")
+    
+    # Create a gather for digit input
+    gather = Gather(
+        action='/api/voice/handle-language',
+        num_digits=1,
+        timeout=5,
+        bargeIn="true"
+    )
+    response.append(gather)
+    
+    # If no input is received, repeat the prompt
+    response.redirect('/api/voice/incoming')
+    
+    return str(response)
+
+@lru_cache(maxsize=256)
+def _transfer_to_human_twiml(message, voice_language):
+    """Build the transfer-to-human TwiML."""
+    response = VoiceResponse()
+    
+    # Select voice based on language
+    voice = _voice_for(voice_language)
+    
+    if message:
+        response.say(message, voice=voice, language=voice_language, volume="loud")
+        response.pause(length=1)
+        
+    # Transfer message depends on language
+    transfer_msg = TRANSFER_MSG_BY_LANG.get(voice_language, TRANSFER_MSG_BY_LANG["en-US"])
+        
+    response.say(transfer_msg, voice=voice, language=voice_language, volume="loud")
+    
+    # Example: Transfer to a specific phone number
+    # response.dial("+1234567890")
+    
+    # Example: Transfer to a queue
+    # response.enqueue("restaurant_staff")
+    
+    return str(response)
+
+@lru_cache(maxsize=256)
+def _goodbye_twiml(message, voice_language):
+    """Build the TwiML for ending the call."""
+    response = VoiceResponse()
+    
+    # Select voice based on language
+    voice = _voice_for(voice_language)
+        
+    response.say(message, voice=voice, language=voice_language, volume="loud")
+    response.hangup()
+    return str(response)
+
+@lru_cache(maxsize=256)
+def _thinking_twiml(thinking_phrase, voice_language):
+    """Build the TwiML for a thinking phrase."""
+    response = VoiceResponse()
+    
+    # Select voice based on language
+    voice = _voice_for(voice_language)
+    
+    # Say the thinking phrase
+    response.say(thinking_phrase, voice=voice, language=voice_language, volume="loud")
+    
+    # Add a pause to simulate thinking
+    response.pause(length=1)
+    
+    # Redirect to continue processing
+    response.redirect('/api/webhook/complete-processing')
+    
+    return str(response)
+
+@lru_cache(maxsize=256)
+def _progressive_twiml(initial_message, voice_language):
+    """Build the TwiML that speaks an acknowledgment and listens immediately."""
+    response = VoiceResponse()
+    
+    # Select voice based on language
+    voice = _voice_for(voice_language)
+    
+    # Say the initial acknowledgment immediately
+    response.say(initial_message, voice=voice, language=voice_language, volume="loud")
+    
+    # Create a gather that will listen immediately
+    gather = Gather(
+        input='speech dtmf',
+        action='/api/webhook/speech',
+        timeout=3,
+        speech_timeout=1,
+        language=voice_language,
+        enhanced=True,
+        speech_model='phone_call',
+        bargeIn="true"
+    )
+    response.append(gather)
+    
+    # If no input is received, redirect
+    response.redirect('/api/webhook/no-input')
+    
+    return str(response)
+
+@lru_cache(maxsize=16)
+def _streaming_twiml_fragments(voice_language):
+    """
+    Build the static TwiML around the dynamic text of a streaming response.
+    
+    Matches what VoiceResponse/Gather would serialize, so the hot path only has to
+    escape and concatenate the spoken text.
+    """
+    language = escape(voice_language, {'"': '&quot;'})
+    say_open = f'<Say language="{language}" voice="{_voice_for(voice_language)}" volume="loud">'
+    gather_attrs = (
+        f'action="/api/webhook/speech" bargeIn="true" enhanced="true" input="speech dtmf" '
+        f'language="{language}" speechModel="phone_call" speechTimeout="1" timeout="2"'
+    )
+    redirect = '<Redirect>/api/webhook/no-input</Redirect></Response>'
+    
+    head = '<?xml version="1.0" encoding="UTF-8"?><Response>' + say_open
+    gather_say = f'</Say><Gather {gather_attrs}>' + say_open
+    gather_end = '</Say></Gather>' + redirect
+    gather_empty = f'</Say><Gather {gather_attrs} />' + redirect
+    return head, gather_say, gather_end, gather_empty
+
+# Precompute every thinking response at import time
+for _language, _phrases in THINKING_PHRASES_BY_LANG.items():
+    for _phrase in _phrases:
+        _thinking_twiml(_phrase, _language)
+
+# Acknowledgments the speech webhook sends at the start of a turn
+ACKNOWLEDGMENT_PHRASES = ("Got it.", "I understand.", "Let me check that.")
+NO_SPEECH_PROMPT = "I didn't catch that. Could you please repeat?"
+PROGRESSIVE_PHRASES = ACKNOWLEDGMENT_PHRASES + (NO_SPEECH_PROMPT,)
+
+for _phrase in PROGRESSIVE_PHRASES:
+    _progressive_twiml(_phrase, "en-US")
+
 class TwilioService:
     def __init__(self):
-        self.client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+        # Reuse pooled keep-alive connections so bursts of REST calls skip TCP/TLS setup;
+        # calls run on worker threads, so the pool is sized for concurrent requests
+        http_client = TwilioHttpClient(pool_connections=True)
+        http_client.session.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=0))
+        http_client.session.headers.update({'Connection': 'keep-alive'})
+        self.client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, http_client=http_client)
         self.phone_number = settings.TWILIO_PHONE_NUMBER
         
     def create_language_selection_response(self, message):
@@ -23,24 +212,7 @@ class TwilioService:
         Returns:
             str: TwiML response as a string
         """
-        response = VoiceResponse()
-        
-        # Add the language selection prompt
-        response.say(message, voice='Polly.Joanna-Neural', language="en-US", volume="loud")
-        
-        # Create a gather for digit input
-        gather = Gather(
-            action='/api/voice/handle-language',
-            num_digits=1,
-            timeout=5,
-            bargeIn="true"
-        )
-        response.append(gather)
-        
-        # If no input is received, repeat the prompt
-        response.redirect('/api/voice/incoming')
-        
-        return str(response)
+        return _language_selection_twiml(message)
         
     def create_progressive_response(self, initial_message, voice_language="en-US"):
         """
@@ -53,33 +225,7 @@ class TwilioService:
         Returns:
             str: TwiML response as a string
         """
-        response = VoiceResponse()
-        
-        # Select voice based on language
-        voice = 'Polly.Joanna-Neural'  # Default voice for English
-        if voice_language == "ur-PK":
-            voice = 'Polly.Aditi-Neural'
-        
-        # Say the initial acknowledgment immediately
-        response.say(initial_message, voice=voice, language=voice_language, volume="loud")
-        
-        # Create a gather that will listen immediately
-        gather = Gather(
-            input='speech dtmf',
-            action='/api/webhook/speech',
-            timeout=3,
-            speech_timeout=1,
-            language=voice_language,
-            enhanced=True,
-            speech_model='phone_call',
-            bargeIn="true"
-        )
-        response.append(gather)
-        
-        # If no input is received, redirect
-        response.redirect('/api/webhook/no-input')
-        
-        return str(response)
+        return _progressive_twiml(initial_message, voice_language)
     
     def create_streaming_response(self, message, voice_language="en-US"):
         """
@@ -92,65 +238,19 @@ class TwilioService:
         Returns:
             str: TwiML response as a string
         """
-        response = VoiceResponse()
-        
-        # Select voice based on language
-        voice = 'Polly.Joanna-Neural'  # Default voice for English
-        if voice_language == "ur-PK":
-            voice = 'Polly.Aditi-Neural'
+        # Split off the first sentence in a single pass
+        parts = _SENT_SPLIT.split(message.strip(), maxsplit=1)
+        first_part = parts[0] or "How can I help you?"  # Fallback for empty messages
+        remaining = parts[1] if len(parts) > 1 else ''
         
-        # Break message into sentences
-        sentences = message.split('. ')
+        # Inject the escaped text into the precomputed TwiML fragments for this language
+        head, gather_say, gather_end, gather_empty = _streaming_twiml_fragments(voice_language)
         
-        # Only speak the first sentence or a short portion initially
-        if sentences and len(sentences) > 0:
-            first_part = sentences[0] + '.'
-            
-            # Speak just the first sentence
-            response.say(first_part, voice=voice, language=voice_language, volume="loud")
-            
-            # Create Gather with responsive settings
-            gather = Gather(
-                input='speech dtmf',
-                action='/api/webhook/speech',
-                timeout=2,  # Short timeout
-                speech_timeout=1,
-                language=voice_language,
-                enhanced=True,
-                speech_model='phone_call',
-                bargeIn="true"
-            )
-            
-            # Add the remainder of the message to the gather
-            # This ensures it won't be spoken if the user interrupts
-            if len(sentences) > 1:
-                remaining = '. '.join(sentences[1:])
-                if remaining and not remaining.endswith('.'):
-                    remaining += '.'
-                gather.say(remaining, voice=voice, language=voice_language, volume="loud")
-            
-            response.append(gather)
-            
-            # If no input is received, redirect
-            response.redirect('/api/webhook/no-input')
-        else:
-            # Fallback for empty messages
-            response.say("How can I help you?", voice=voice, language=voice_language, volume="loud")
-            
-            gather = Gather(
-                input='speech dtmf',
-                action='/api/webhook/speech',
-                timeout=2,
-                speech_timeout=1,
-                language=voice_language,
-                enhanced=True,
-                speech_model='phone_call',
-                bargeIn="true"
-            )
-            response.append(gather)
-            response.redirect('/api/webhook/no-input')
-        
-        return str(response)
+        # Speak just the first sentence, then listen. The remainder is spoken inside the
+        # gather so it won't be spoken if the user interrupts
+        if remaining:
+            return head + escape(first_part) + gather_say + escape(remaining) + gather_end
+        return head + escape(first_part) + gather_empty
         
     def create_twiml_response(self, message, gather_speech=True, timeout=2, speech_timeout=1, voice_language="en-US"):
         """
@@ -171,82 +271,20 @@ class TwilioService:
     
     def create_transfer_to_human_response(self, message=None, voice_language="en-US"):
         """Create a TwiML response that transfers to a human."""
-        response = VoiceResponse()
-        
-        # Select appropriate voice based on language
-        voice = 'Polly.Joanna-Neural'  # Default voice for English
-        if voice_language == "ur-PK":
-            voice = 'Polly.Aditi-Neural'  # Use an Indian voice as closest to Urdu
-        
-        if message:
-            response.say(message, voice=voice, language=voice_language, volume="loud")
-            response.pause(length=1)
-            
-        # Transfer message depends on language
-        transfer_msg = "Transferring you to one of our staff. Please hold."
-        if voice_language == "ur-PK":
-            transfer_msg = "آپ کو ہمارے عملے کے ایک رکن سے منسلک کیا جا رہا ہے۔ براہ کرم انتظار کریں۔"
-            
-        response.say(transfer_msg, voice=voice, language=voice_language, volume="loud")
-        
-        # Example: Transfer to a specific phone number
-        # response.dial("+1234567890")
-        
-        # Example: Transfer to a queue
-        # response.enqueue("restaurant_staff")
-        
-        return str(response)
+        return _transfer_to_human_twiml(message, voice_language)
     
     def create_goodbye_response(self, message, voice_language="en-US"):
         """Create a TwiML response for ending the call."""
-        response = VoiceResponse()
-        
-        # Select appropriate voice based on language
-        voice = 'Polly.Joanna-Neural'  # Default voice for English
-        if voice_language == "ur-PK":
-            voice = 'Polly.Aditi-Neural'  # Use an Indian voice as closest to Urdu
-            
-        response.say(message, voice=voice, language=voice_language, volume="loud")
-        response.hangup()
-        return str(response)
+        return _goodbye_twiml(message, voice_language)
         
     def create_thinking_response(self, voice_language="en-US"):
         """Create a response with thinking sounds to bridge processing time."""
-        response = VoiceResponse()
-        
-        # Select appropriate voice based on language
-        voice = 'Polly.Joanna-Neural'  # Default voice for English
-        if voice_language == "ur-PK":
-            voice = 'Polly.Aditi-Neural'
-        
-        # Choose a random thinking phrase
-        thinking_phrases = [
-            "Let me check that for you.",
-            "Just a moment.",
-            "Looking that up now."
-        ]
-        if voice_language == "ur-PK":
-            thinking_phrases = [
-                "میں آپ کے لیے چیک کر رہا ہوں۔",
-                "بس ایک لمحے۔",
-                "ابھی دیکھ رہا ہوں۔"
-            ]
-        
-        thinking_phrase = random.choice(thinking_phrases)
-        
-        # Say the thinking phrase
-        response.say(thinking_phrase, voice=voice, language=voice_language, volume="loud")
-        
-        # Add a pause to simulate thinking
-        response.pause(length=1)
-        
-        # Redirect to continue processing
-        response.redirect('/api/webhook/complete-processing')
-        
-        return str(response)
+        # Choose a random thinking phrase outside the memoized builder
+        thinking_phrases = THINKING_PHRASES_BY_LANG.get(voice_language, THINKING_PHRASES_BY_LANG["en-US"])
+        return _thinking_twiml(random.choice(thinking_phrases), voice_language)
     
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    def make_call(self, to_number, webhook_url=None):
+    async def make_call(self, to_number, webhook_url=None):
         """
         Initiate an outbound call using Twilio.
         
@@ -261,7 +299,9 @@ class TwilioService:
             webhook_url = settings.TWILIO_WEBHOOK_URL
             
         try:
-            call = self.client.calls.create(
+            # Run the blocking SDK call off the event loop
+            call = await asyncio.to_thread(
+                self.client.calls.create,
                 to=to_number,
                 from_=self.phone_number,
                 url=webhook_url,
@@ -269,13 +309,13 @@ class TwilioService:
                 status_callback_event=['initiated', 'ringing', 'answered', 'completed'],
                 status_callback_method='POST'
             )
-            logger.info(f"Initiated call to {to_number}, SID: {call.sid}")
+            logger.info("Initiated call to %s, SID: %s", to_number, call.sid)
             return call.sid
         except Exception as e:
-            logger.error(f"Failed to initiate call to {to_number}: {str(e)}")
+            logger.error("Failed to initiate call to %s: %s", to_number, e)
             raise
     
-    def get_call_info(self, call_sid):
+    async def get_call_info(self, call_sid):
         """
         Get information about a specific call.
         
@@ -286,7 +326,7 @@ class TwilioService:
             dict: Call information
         """
         try:
-            call = self.client.calls(call_sid).fetch()
+            call = await asyncio.to_thread(self.client.calls(call_sid).fetch)
             return {
                 'sid': call.sid,
                 'status': call.status,
@@ -298,10 +338,10 @@ class TwilioService:
                 'end_time': call.end_time
             }
         except Exception as e:
-            logger.error(f"Failed to get call info for SID {call_sid}: {str(e)}")
+            logger.error("Failed to get call info for SID %s: %s", call_sid, e)
             return None
     
-    def end_call(self, call_sid):
+    async def end_call(self, call_sid):
         """
         End an in-progress call.
         
@@ -312,11 +352,11 @@ class TwilioService:
             bool: Success status
         """
         try:
-            self.client.calls(call_sid).update(status="completed")
-            logger.info(f"Ended call with SID {call_sid}")
+            await asyncio.to_thread(self.client.calls(call_sid).update, status="completed")
+            logger.info("Ended call with SID %s", call_sid)
             return True
         except Exception as e:
-            logger.error(f"Failed to end call with SID {call_sid}: {str(e)}")
+            logger.error("Failed to end call with SID %s: %s", call_sid, e)
             return False
 
 # Create a singleton instance
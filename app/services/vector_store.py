@@ -1,26 +1,91 @@
 import os
 import json
+import asyncio
+import hashlib
+import tempfile
 import logging
-from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
-from openai import OpenAI
+from openai import AsyncOpenAI
+from prometheus_client import Counter
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from app.config import settings
+from app.services.http_client import http_client
 
 logger = logging.getLogger(__name__)
 
-# Create OpenAI client
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+# Create async OpenAI client over the shared connection pool for queries
+async_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, http_client=http_client)
+
+# Maximum number of inputs the embeddings endpoint accepts per request
+EMBEDDING_BATCH_SIZE = 2048
+
+# Maximum concurrent per-item requests when batched embedding is unavailable
+EMBEDDING_CONCURRENCY = 8
+
+# Number of query embeddings kept in the LRU cache
+QUERY_CACHE_SIZE = 1024
+
+# Rows of the int8 matrix widened per block when scoring a quantized store
+QUANTIZED_BLOCK_ROWS = 1024
+
+EMBEDDING_CACHE_REQUESTS = Counter(
+    "embedding_cache_requests_total", "Query embedding cache lookups", ["result"]
+)
+
+
+def _run_sync(coro):
+    """Run a coroutine to completion, even when called from inside a running event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # A loop is already running in this thread, so drive the coroutine from a worker thread
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores in descending order, without a full sort."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+def _quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Quantize rows to int8 with a symmetric per-row scale."""
+    scales = (np.max(np.abs(matrix), axis=1) / 127.0).astype(np.float32)
+    scales[scales == 0] = 1.0
+    quantized = np.round(matrix / scales[:, None]).astype(np.int8)
+    return quantized, scales
 
 class VectorStore:
     """A simple vector store implementation for the restaurant knowledge base."""
     
-    def __init__(self, knowledge_file: str = None):
+    def __init__(self, knowledge_file: str = None, build_index: bool = True):
         """Initialize the vector store with knowledge."""
-        self.embedding_model = "text-embedding-ada-002"
+        self.embedding_model = "text-embedding-3-small"
+        self.embedding_dims = 512
         self.knowledge_base = []
-        self.vector_store = []
+        
+        # Embeddings as one L2-normalized float32 matrix, with items and texts as parallel lists
+        self.items = []
+        self.texts = []
+        self.matrix: Optional[np.ndarray] = np.empty((0, self.embedding_dims), dtype=np.float32)
+        self.type_rows: Dict[str, np.ndarray] = {}
+        
+        # Optional int8 matrix with per-row scales, replacing the float32 matrix
+        self.quantize = settings.QUANTIZE_EMBEDDINGS
+        self.matrix_i8: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        
+        # LRU cache of query embeddings keyed on normalized query text
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
         
         # Load knowledge from file if provided, otherwise use default
         if knowledge_file and os.path.exists(knowledge_file):
@@ -28,10 +93,20 @@ class VectorStore:
         else:
             self._load_default_knowledge()
             
-        # Generate embeddings for all knowledge items
-        self._generate_embeddings()
-        
-        logger.info(f"Vector store initialized with {len(self.knowledge_base)} knowledge items")
+        # Reuse embeddings cached on disk for this knowledge base, otherwise generate them
+        if build_index:
+            if not self._load_cached_embeddings():
+                self._generate_embeddings()
+            logger.info("Vector store initialized with %s knowledge items", len(self.knowledge_base))
+    
+    @classmethod
+    async def create_async(cls, knowledge_file: str = None) -> "VectorStore":
+        """Create a vector store, awaiting embedding generation instead of blocking the loop."""
+        store = cls(knowledge_file, build_index=False)
+        if not store._load_cached_embeddings():
+            await store._generate_embeddings_async()
+        logger.info("Vector store initialized with %s knowledge items", len(store.knowledge_base))
+        return store
         
     def _load_knowledge_from_file(self, file_path: str):
         """Load knowledge base from a JSON file."""
@@ -39,9 +114,9 @@ class VectorStore:
             with open(file_path, 'r') as f:
                 data = json.load(f)
                 self.knowledge_base = data
-                logger.info(f"Loaded knowledge base from {file_path}")
+                logger.info("Loaded knowledge base from %s", file_path)
         except Exception as e:
-            logger.error(f"Error loading knowledge base from {file_path}: {e}")
+            logger.error("Error loading knowledge base from %s: %s", file_path, e)
             self._load_default_knowledge()
             
     def _load_default_knowledge(self):
@@ -130,107 +205,270 @@ class VectorStore:
             }
         ]
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=10))
-    def _get_embedding(self, text: str) -> List[float]:
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=10), reraise=True)
+    async def _request_embedding(self, text: str, openai_client: Optional[AsyncOpenAI] = None) -> np.ndarray:
         """Generate embedding for a text using OpenAI's API."""
+        response = await (openai_client or async_client).embeddings.create(
+            model=self.embedding_model,
+            input=text,
+            dimensions=self.embedding_dims
+        )
+        return np.asarray(response.data[0].embedding, dtype=np.float32)
+    
+    async def _get_embedding(self, text: str) -> np.ndarray:
+        """Get the embedding for a query, serving repeated queries from the LRU cache."""
+        text_norm = " ".join(text.lower().split())
+        if text_norm:
+            cached = self._query_cache.get(text_norm)
+            if cached is not None:
+                self._query_cache.move_to_end(text_norm)
+                EMBEDDING_CACHE_REQUESTS.labels("hit").inc()
+                return cached
+            EMBEDDING_CACHE_REQUESTS.labels("miss").inc()
+        
         try:
-            response = client.embeddings.create(
-                model=self.embedding_model,
-                input=text
-            )
-            return response.data[0].embedding
+            embedding = await self._request_embedding(text_norm or text)
         except Exception as e:
-            logger.error(f"Error generating embedding: {e}")
-            # Return a vector of zeros as fallback
-            return [0.0] * 1536  # Embedding size for text-embedding-ada-002
+            logger.error("Error generating embedding: %s", e)
+            # Return a vector of zeros as fallback, without caching it
+            return np.zeros(self.embedding_dims, dtype=np.float32)
+        
+        if text_norm:
+            # Cached vectors are shared between callers, so guard them against mutation
+            embedding.flags.writeable = False
+            self._query_cache[text_norm] = embedding
+            if len(self._query_cache) > QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+        return embedding
+            
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=10), reraise=True)
+    async def _get_embeddings_batch(self, texts: List[str], openai_client: AsyncOpenAI) -> np.ndarray:
+        """Generate embeddings for several texts in a single OpenAI request."""
+        response = await openai_client.embeddings.create(
+            model=self.embedding_model,
+            input=texts,
+            dimensions=self.embedding_dims
+        )
+        data = sorted(response.data, key=lambda d: d.index)
+        return np.asarray([d.embedding for d in data], dtype=np.float32)
+    
+    async def _get_embeddings_concurrent(self, texts: List[str], openai_client: AsyncOpenAI) -> np.ndarray:
+        """Generate embeddings one text per request, running the requests concurrently."""
+        sem = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+        
+        async def one(text: str) -> np.ndarray:
+            async with sem:
+                return await self._request_embedding(text, openai_client)
+        
+        return np.stack(await asyncio.gather(*[one(text) for text in texts]))
+    
+    def _item_text(self, item: Dict[str, Any]) -> str:
+        """Create a single string representation of a knowledge item."""
+        if item['type'] == 'menu_item':
+            return f"{item['name']}: {item['description']} Price: ${item['price']:.2f}. Category: {item['category']}."
+        return item.get('content', '')
             
     def _generate_embeddings(self):
         """Generate embeddings for all knowledge items."""
-        self.vector_store = []
-        for item in self.knowledge_base:
-            # Create a single string representation of the item
+        _run_sync(self._generate_embeddings_async())
+    
+    async def _generate_embeddings_async(self):
+        """Generate embeddings for all knowledge items, batched or concurrently per item."""
+        texts = [self._item_text(item) for item in self.knowledge_base]
+        
+        # Use a dedicated client: the shared pool must not be bound to this short-lived loop
+        async with AsyncOpenAI(api_key=settings.OPENAI_API_KEY) as openai_client:
+            generated = True
+            try:
+                # Embed in as few requests as possible
+                embeddings = np.concatenate([
+                    await self._get_embeddings_batch(texts[start:start + EMBEDDING_BATCH_SIZE], openai_client)
+                    for start in range(0, len(texts), EMBEDDING_BATCH_SIZE)
+                ])
+            except Exception as e:
+                logger.warning("Batched embedding failed, falling back to concurrent requests: %s", e)
+                try:
+                    embeddings = await self._get_embeddings_concurrent(texts, openai_client)
+                except Exception as e:
+                    logger.error("Error generating embeddings: %s", e)
+                    # Use vectors of zeros as fallback
+                    embeddings = np.zeros((len(texts), self.embedding_dims), dtype=np.float32)
+                    generated = False
+        
+        # Store embeddings as a single normalized matrix so similarity is a dot product
+        matrix = embeddings.reshape(len(texts), -1)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+        
+        self.items = list(self.knowledge_base)
+        self.texts = texts
+        self.matrix = matrix
+        
+        # Only persist real embeddings, never the fallback; save before indexing
+        # since quantization releases the float32 matrix
+        if generated:
+            self._save_cached_embeddings()
+        self._build_indices()
+    
+    def _cache_path(self) -> str:
+        """Path of the on-disk embedding cache for the current knowledge base."""
+        kb_hash = hashlib.sha256(json.dumps(self.knowledge_base, sort_keys=True).encode()).hexdigest()[:16]
+        return os.path.join(settings.EMBEDDING_CACHE_DIR, f"emb_{self.embedding_model}_{self.embedding_dims}_{kb_hash}.npy")
+    
+    def _load_cached_embeddings(self) -> bool:
+        """Load the embedding matrix and items from disk if cached for this knowledge base."""
+        matrix_path = self._cache_path()
+        items_path = os.path.splitext(matrix_path)[0] + ".json"
+        if not (os.path.exists(matrix_path) and os.path.exists(items_path)):
+            return False
+        
+        try:
+            with open(items_path, 'r') as f:
+                data = json.load(f)
+            matrix = np.load(matrix_path, mmap_mode='r')
+        except Exception as e:
+            logger.warning("Error loading cached embeddings from %s: %s", matrix_path, e)
+            return False
+        
+        self.items = data['items']
+        self.texts = data['texts']
+        self.matrix = matrix
+        self._build_indices()
+        logger.info("Loaded cached embeddings from %s", matrix_path)
+        return True
+    
+    def _save_cached_embeddings(self):
+        """Persist the embedding matrix and items to disk."""
+        matrix_path = self._cache_path()
+        items_path = os.path.splitext(matrix_path)[0] + ".json"
+        try:
+            os.makedirs(settings.EMBEDDING_CACHE_DIR, exist_ok=True)
+            # Write to uniquely named temporary files first, so a concurrent reader never sees
+            # a partial cache and concurrent writers never share a file
+            matrix_fd, matrix_tmp = tempfile.mkstemp(dir=settings.EMBEDDING_CACHE_DIR, suffix=".npy.tmp")
+            items_fd, items_tmp = tempfile.mkstemp(dir=settings.EMBEDDING_CACHE_DIR, suffix=".json.tmp")
+            try:
+                with os.fdopen(matrix_fd, 'wb') as f:
+                    np.save(f, self.matrix)
+                with os.fdopen(items_fd, 'w') as f:
+                    json.dump({'items': self.items, 'texts': self.texts}, f)
+                os.replace(items_tmp, items_path)
+                os.replace(matrix_tmp, matrix_path)
+            finally:
+                for tmp in (matrix_tmp, items_tmp):
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+        except Exception as e:
+            logger.warning("Error saving cached embeddings to %s: %s", matrix_path, e)
+    
+    def _build_indices(self):
+        """Build lookup structures over the loaded items."""
+        if self.quantize:
+            self.matrix_i8, self.scales = _quantize_int8(self.matrix)
+            # Keep only the int8 copy, so quantizing actually saves memory
+            self.matrix = None
+        
+        # Row indices of each item type, for filtered searches
+        type_rows: Dict[str, List[int]] = {}
+        for i, item in enumerate(self.items):
+            type_rows.setdefault(item['type'], []).append(i)
+        self.type_rows = {item_type: np.asarray(rows, dtype=np.int32) for item_type, rows in type_rows.items()}
+        
+        # Exact-match lookups keyed on lowercase names
+        self._by_menu_item_name: Dict[str, Dict[str, Any]] = {}
+        self._by_category: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_policy_topic: Dict[str, Dict[str, Any]] = {}
+        self._specials: List[Dict[str, Any]] = []
+        for item in self.items:
             if item['type'] == 'menu_item':
-                text = f"{item['name']}: {item['description']} Price: ${item['price']:.2f}. Category: {item['category']}."
-            else:
-                text = item.get('content', '')
-                
-            # Generate embedding
-            embedding = self._get_embedding(text)
-            
-            # Store item with its embedding
-            self.vector_store.append({
-                'item': item,
-                'embedding': embedding,
-                'text': text
-            })
-            
-    def _cosine_similarity(self, a: List[float], b: List[float]) -> float:
-        """Calculate cosine similarity between two vectors."""
-        a = np.array(a)
-        b = np.array(b)
-        return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+                self._by_menu_item_name.setdefault(item['name'].lower(), item)
+                self._by_category.setdefault(item['category'].lower(), []).append(item)
+            elif item['type'] == 'policy':
+                self._by_policy_topic.setdefault(item['topic'].lower(), item)
+            elif item['type'] == 'special':
+                self._specials.append(item)
+    
+    async def _query_vector(self, query: str) -> np.ndarray:
+        """Embed a query as an L2-normalized float32 vector."""
+        q = await self._get_embedding(query)
+        return q / (np.linalg.norm(q) + 1e-12)
             
-    def search(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+    def _similarities(self, query_vector: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the query against every item."""
+        if self.matrix_i8 is None:
+            return self.matrix @ query_vector
+        
+        # Widen a fixed-size block of int8 rows at a time, so a query never copies the whole
+        # matrix, then rescale; int8 values are exact in float32, so BLAS does the dot products
+        sims = np.empty(self.matrix_i8.shape[0], dtype=np.float32)
+        for start in range(0, sims.shape[0], QUANTIZED_BLOCK_ROWS):
+            block = self.matrix_i8[start:start + QUANTIZED_BLOCK_ROWS]
+            sims[start:start + block.shape[0]] = block.astype(np.float32) @ query_vector
+        return sims * self.scales
+    
+    def _results(self, idx: np.ndarray, sims: np.ndarray) -> List[Dict[str, Any]]:
+        """Build search results for the given rows, in order."""
+        return [
+            {
+                'item': self.items[i],
+                'text': self.texts[i],
+                'similarity': float(sims[i])
+            }
+            for i in idx
+        ]
+    
+    async def search(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
         """Search for relevant knowledge items given a query."""
         # Generate embedding for the query
-        query_embedding = self._get_embedding(query)
-        
-        # Calculate similarity with all items
-        results = []
-        for item in self.vector_store:
-            similarity = self._cosine_similarity(query_embedding, item['embedding'])
-            results.append({
-                'item': item['item'],
-                'text': item['text'],
-                'similarity': similarity
-            })
-            
-        # Sort by similarity and return top_k
-        results.sort(key=lambda x: x['similarity'], reverse=True)
-        return results[:top_k]
+        query_vector = await self._query_vector(query)
+        
+        # Calculate similarity with all items in a single matrix-vector product
+        sims = self._similarities(query_vector)
+        
+        # Select the top_k without sorting every item
+        return self._results(_top_k(sims, top_k), sims)
     
-    def search_by_type(self, query: str, item_type: str, top_k: int = 3) -> List[Dict[str, Any]]:
+    async def search_by_type(self, query: str, item_type: str, top_k: int = 3) -> List[Dict[str, Any]]:
         """Search for relevant knowledge items of a specific type."""
         # Generate embedding for the query
-        query_embedding = self._get_embedding(query)
-        
-        # Filter items by type and calculate similarity
-        results = []
-        for item in self.vector_store:
-            if item['item']['type'] == item_type:
-                similarity = self._cosine_similarity(query_embedding, item['embedding'])
-                results.append({
-                    'item': item['item'],
-                    'text': item['text'],
-                    'similarity': similarity
-                })
-                
-        # Sort by similarity and return top_k
-        results.sort(key=lambda x: x['similarity'], reverse=True)
-        return results[:top_k]
+        query_vector = await self._query_vector(query)
+        
+        # Score all items, then restrict to the rows of the requested type
+        sims = self._similarities(query_vector)
+        rows = self.type_rows.get(item_type, np.empty(0, dtype=np.int32))
+        local = sims[rows]
+        
+        # Select the top_k without sorting every candidate
+        return self._results(rows[_top_k(local, top_k)], sims)
     
     def get_menu_item(self, item_name: str) -> Optional[Dict[str, Any]]:
         """Get a specific menu item by name."""
-        for item in self.knowledge_base:
-            if item['type'] == 'menu_item' and item['name'].lower() == item_name.lower():
-                return item
-        return None
+        return self._by_menu_item_name.get(item_name.lower())
     
     def get_menu_category(self, category: str) -> List[Dict[str, Any]]:
         """Get all menu items in a category."""
-        return [item for item in self.knowledge_base 
-                if item['type'] == 'menu_item' and item['category'].lower() == category.lower()]
+        return list(self._by_category.get(category.lower(), []))
     
     def get_specials(self) -> List[Dict[str, Any]]:
         """Get all current specials."""
-        return [item for item in self.knowledge_base if item['type'] == 'special']
+        return list(self._specials)
     
     def get_policy(self, topic: str) -> Optional[Dict[str, Any]]:
         """Get a specific policy by topic."""
-        for item in self.knowledge_base:
-            if item['type'] == 'policy' and item['topic'].lower() == topic.lower():
-                return item
-        return None
+        return self._by_policy_topic.get(topic.lower())
+
+# Singleton instance, built on first use or at application startup
+_vector_store: Optional[VectorStore] = None
+
+def get_vector_store() -> VectorStore:
+    """Get the shared vector store, building it on first use."""
+    global _vector_store
+    if _vector_store is None:
+        _vector_store = VectorStore()
+    return _vector_store
 
-# Create a singleton instance
-vector_store = VectorStore()
\ No newline at end of file
+async def init_vector_store() -> VectorStore:
+    """Build the shared vector store without blocking the event loop."""
+    global _vector_store
+    if _vector_store is None:
+        _vector_store = await VectorStore.create_async()
+    return _vector_store
\ No newline at end of file
@@ -1,11 +1,32 @@
 import re
 from datetime import datetime
+from functools import lru_cache
+from collections import deque
+from itertools import islice
+import io
 import logging
 import json
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple, Union, IO, Deque
+import numpy as np
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # orjson is optional
+    _json_loads = json.loads
+
+try:
+    import json_stream
+except ImportError:  # json-stream is optional
+    json_stream = None
 
 logger = logging.getLogger(__name__)
 
+# Matches any non-digit character
+_NON_DIGIT_RE = re.compile(r'\D')
+
+# Deletes ASCII non-digits, which covers realistically formatted phone numbers
+_ASCII_NON_DIGITS = str.maketrans('', '', ''.join(chr(i) for i in range(128) if not chr(i).isdigit()))
+
 def parse_phone_number(phone_number: str) -> str:
     """
     Normalize phone number format.
@@ -19,21 +40,92 @@ def parse_phone_number(phone_number: str) -> str:
     if not phone_number:
         return ""
     
+    # Numbers with a "+" (E.164 included) are returned as given, so skip stripping
+    if phone_number[0] == '+':
+        return phone_number
+    
+    # A bare 10-digit US number without country code
+    if len(phone_number) == 10 and phone_number.isdecimal():
+        return f"+1{phone_number}"
+    
     # Remove all non-numeric characters
-    digits_only = re.sub(r'\D', '', phone_number)
-    
-    # Ensure it starts with a "+" if it doesn't already
-    if not phone_number.startswith('+'):
-        # If it's a US number without country code (10 digits)
-        if len(digits_only) == 10:
-            return f"+1{digits_only}"
-        # If it already has the country code
-        elif len(digits_only) > 10:
-            return f"+{digits_only}"
-    
-    # Return original number format if it already had "+"
+    digits_only = phone_number.translate(_ASCII_NON_DIGITS)
+    if not digits_only.isdecimal():
+        # Non-ASCII separators remain, so strip them with the regex
+        digits_only = _NON_DIGIT_RE.sub('', digits_only)
+    
+    # If it's a US number without country code (10 digits)
+    if len(digits_only) == 10:
+        return f"+1{digits_only}"
+    # If it already has the country code
+    elif len(digits_only) > 10:
+        return f"+{digits_only}"
+    
+    # Too few digits to normalize, so return the original format
     return phone_number
 
+# Bound once so the format loop skips the class attribute lookup
+_STRPTIME = datetime.strptime
+
+# Formats accepted by parse_datetime, most common first
+_DATETIME_FORMATS = (
+    "%Y-%m-%dT%H:%M:%SZ",     # ISO format with Z
+    "%Y-%m-%dT%H:%M:%S.%fZ",  # ISO format with milliseconds and Z
+    "%Y-%m-%dT%H:%M:%S",      # ISO format without timezone
+    "%Y-%m-%d %H:%M:%S",      # Standard format
+    "%Y-%m-%d %H:%M",         # Without seconds
+    "%Y-%m-%d",               # Date only
+    "%m/%d/%Y %H:%M:%S",      # US format with time
+    "%m/%d/%Y",               # US format date only
+)
+
+def _guess_datetime_format(s: str) -> Optional[str]:
+    """Pick the format a canonically written string uses from its length and separators."""
+    n = len(s)
+    if n == 10:
+        if s[4] == '-':
+            return "%Y-%m-%d"
+        if s[2] == '/':
+            return "%m/%d/%Y"
+    elif n == 19:
+        if s[2] == '/':
+            return "%m/%d/%Y %H:%M:%S"
+        if s[10] == 'T':
+            return "%Y-%m-%dT%H:%M:%S"
+        if s[10] == ' ':
+            return "%Y-%m-%d %H:%M:%S"
+    elif n == 20:
+        if s[10] == 'T' and s[19] == 'Z':
+            return "%Y-%m-%dT%H:%M:%SZ"
+    elif n == 16:
+        if s[10] == ' ':
+            return "%Y-%m-%d %H:%M"
+    elif 22 <= n <= 27:
+        if s[10] == 'T' and s[19] == '.' and s[-1] == 'Z':
+            return "%Y-%m-%dT%H:%M:%S.%fZ"
+    return None
+
+@lru_cache(maxsize=4096)
+def _parse_datetime_cached(datetime_str: str) -> Optional[datetime]:
+    """Parse with the format the string's shape selects; memoized since the same timestamps recur."""
+    # Canonically written strings parse with a single strptime and no exceptions
+    fmt = _guess_datetime_format(datetime_str)
+    if fmt is not None:
+        try:
+            return _STRPTIME(datetime_str, fmt)
+        except ValueError:
+            pass
+    
+    # strptime also accepts loosely written values such as unpadded fields
+    for other in _DATETIME_FORMATS:
+        if other == fmt:
+            continue
+        try:
+            return _STRPTIME(datetime_str, other)
+        except ValueError:
+            continue
+    return None
+
 def parse_datetime(datetime_str: Optional[str]) -> Optional[datetime]:
     """
     Parse datetime string to datetime object.
@@ -47,25 +139,10 @@ def parse_datetime(datetime_str: Optional[str]) -> Optional[datetime]:
     if not datetime_str:
         return None
     
-    formats_to_try = [
-        "%Y-%m-%dT%H:%M:%S.%fZ",  # ISO format with milliseconds and Z
-        "%Y-%m-%dT%H:%M:%SZ",     # ISO format with Z
-        "%Y-%m-%dT%H:%M:%S",      # ISO format without timezone
-        "%Y-%m-%d %H:%M:%S",      # Standard format
-        "%Y-%m-%d %H:%M",         # Without seconds
-        "%Y-%m-%d",               # Date only
-        "%m/%d/%Y %H:%M:%S",      # US format with time
-        "%m/%d/%Y",               # US format date only
-    ]
-    
-    for fmt in formats_to_try:
-        try:
-            return datetime.strptime(datetime_str, fmt)
-        except ValueError:
-            continue
-    
-    logger.warning(f"Could not parse datetime string: {datetime_str}")
-    return None
+    parsed = _parse_datetime_cached(datetime_str)
+    if parsed is None:
+        logger.warning("Could not parse datetime string: %s", datetime_str)
+    return parsed
 
 def calculate_order_total(order_items: List[Dict[str, Any]], menu_items: Dict[str, int], delivery_fee: int = 0) -> int:
     """
@@ -79,27 +156,78 @@ def calculate_order_total(order_items: List[Dict[str, Any]], menu_items: Dict[st
     Returns:
         int: Total order cost in cents
     """
-    total = 0
-    
-    for item in order_items:
-        item_name = item.get("item", "").lower()
-        quantity = item.get("quantity", 1)
-        
-        # Try to find the price, defaulting to 1000 cents if unknown
-        price = menu_items.get(item_name, 1000)
-        total += price * quantity
+    # Try to find each price, defaulting to 1000 cents if unknown
+    get_price = menu_items.get
+    total = sum(get_price(item.get("item", "").lower(), 1000) * item.get("quantity", 1) for item in order_items)
     
     # Add delivery fee if any
-    total += delivery_fee
+    return total + delivery_fee
+
+# JIT kernel for calculate_order_totals_batch, compiled on first use so importing this module
+# doesn't pay for importing numba; False until the first call tries
+_order_totals_jit = False
+
+def _get_order_totals_jit():
+    """Compile the numba batch-totals kernel, or return None if numba is not installed."""
+    global _order_totals_jit
+    if _order_totals_jit is not False:
+        return _order_totals_jit
+    try:
+        from numba import njit, prange
+    except ImportError:  # numba is optional
+        _order_totals_jit = None
+        return None
     
-    return total
+    @njit(parallel=True)
+    def order_totals(quantities, prices, delivery_fees):
+        """Sum quantity * price per order row in parallel, then add the delivery fee."""
+        n, m = quantities.shape
+        out = np.empty(n, dtype=np.int64)
+        for i in prange(n):
+            total = 0
+            for j in range(m):
+                total += quantities[i, j] * prices[i, j]
+            out[i] = total + delivery_fees[i]
+        return out
+    
+    _order_totals_jit = order_totals
+    return order_totals
+
+def calculate_order_totals_batch(quantities: np.ndarray, prices: np.ndarray, delivery_fees: np.ndarray) -> np.ndarray:
+    """
+    Calculate total cost in cents for many orders at once.
+    
+    Args:
+        quantities (np.ndarray): (n_orders, max_items) item quantities, zero-padded
+        prices (np.ndarray): (n_orders, max_items) item prices in cents, zero-padded
+        delivery_fees (np.ndarray): (n_orders,) delivery fees in cents
+        
+    Returns:
+        np.ndarray: (n_orders,) total order costs in cents
+    """
+    quantities = np.ascontiguousarray(quantities, dtype=np.int64)
+    prices = np.ascontiguousarray(prices, dtype=np.int64)
+    delivery_fees = np.ascontiguousarray(delivery_fees, dtype=np.int64)
+    
+    order_totals_jit = _get_order_totals_jit()
+    if order_totals_jit is not None:
+        return order_totals_jit(quantities, prices, delivery_fees)
+    return (quantities * prices).sum(axis=1) + delivery_fees
+
+# Distinguishes a failed parse from a document that is itself null
+_MISSING = object()
 
-def safe_json_loads(json_str: str, default: Any = None) -> Any:
+def safe_json_loads(json_str: Union[str, bytes], default: Any = None) -> Any:
     """
     Safely load JSON string, returning default value on error.
     
+    Parsed with orjson when installed. Documents that orjson rejects (NaN, Infinity, numbers
+    that overflow a double) are retried with json.loads, so they parse as before. One
+    difference remains: orjson returns integers outside the 64-bit range as floats,
+    losing precision, where json.loads returns exact ints.
+    
     Args:
-        json_str (str): JSON string to parse
+        json_str (str | bytes): JSON string to parse; bytes are parsed without decoding first
         default (Any): Default value to return on error
         
     Returns:
@@ -109,26 +237,116 @@ def safe_json_loads(json_str: str, default: Any = None) -> Any:
         return default
         
     try:
-        return json.loads(json_str)
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error: {str(e)}")
+        return _json_loads(json_str)
+    except ValueError as e:  # json.JSONDecodeError and orjson.JSONDecodeError
+        if _json_loads is not json.loads:
+            try:
+                return json.loads(json_str)
+            except ValueError:
+                pass
+        logger.error("JSON decode error: %s", e)
         return default
 
-def truncate_conversation_for_context(conversation_history: List[Dict[str, str]], max_turns: int = 10) -> List[Dict[str, str]]:
+def _place_partial(container: Any, rel_path: Tuple, value: Any) -> None:
+    """Insert a streamed value into a partially rebuilt container at a relative path."""
+    for key, next_key in zip(rel_path, rel_path[1:]):
+        if isinstance(container, list):
+            if key == len(container):
+                container.append([] if isinstance(next_key, int) else {})
+        elif key not in container:
+            container[key] = [] if isinstance(next_key, int) else {}
+        container = container[key]
+    
+    if isinstance(container, list):
+        container.append(value)
+    else:
+        container[rel_path[-1]] = value
+
+def safe_json_loads_partial(json_str_or_file: Union[str, bytes, IO], keys: List[Tuple[Union[str, int], ...]],
+                            default: Any = None) -> Dict[Tuple[Union[str, int], ...], Any]:
+    """
+    Safely extract selected paths from a JSON document without materializing the rest of it.
+    
+    Args:
+        json_str_or_file (str | bytes | IO): JSON string, bytes or readable file
+        keys (List[Tuple]): Paths to extract, e.g. [("event",), ("payload", "customer", "phone")]
+        default (Any): Value for paths that are missing, or for all paths on error
+        
+    Returns:
+        Dict[Tuple, Any]: Value found at each requested path, or default
+    """
+    result = {key: default for key in keys}
+    if not json_str_or_file:
+        return result
+    
+    if json_stream is None:
+        # Without json-stream, parse the whole document and walk each path
+        if hasattr(json_str_or_file, "read"):
+            json_str_or_file = json_str_or_file.read()
+        data = safe_json_loads(json_str_or_file, _MISSING)
+        if data is _MISSING:
+            return result
+        for key in keys:
+            value = data
+            for part in key:
+                try:
+                    value = value[part]
+                except (KeyError, IndexError, TypeError):
+                    value = default
+                    break
+            result[key] = value
+        return result
+    
+    if isinstance(json_str_or_file, str):
+        json_str_or_file = io.StringIO(json_str_or_file)
+    elif isinstance(json_str_or_file, bytes):
+        json_str_or_file = io.BytesIO(json_str_or_file)
+    
+    # Leaves stream past one at a time, so memory stays proportional to the nesting depth
+    wanted = set(keys)
+    found = {}
+    
+    def visitor(item: Any, path: Tuple) -> None:
+        for depth in range(len(path) + 1):
+            prefix = path[:depth]
+            if prefix not in wanted:
+                continue
+            if depth == len(path):
+                found[prefix] = item
+            else:
+                container = found.setdefault(prefix, [] if isinstance(path[depth], int) else {})
+                _place_partial(container, path[depth:], item)
+    
+    try:
+        json_stream.visit(json_str_or_file, visitor)
+    except ValueError as e:
+        logger.error("JSON decode error: %s", e)
+        return result
+    
+    result.update(found)
+    return result
+
+def truncate_conversation_for_context(conversation_history: Union[List[Dict[str, str]], Deque[Dict[str, str]]],
+                                      max_turns: int = 10) -> Union[List[Dict[str, str]], Deque[Dict[str, str]]]:
     """
     Truncate conversation history to the most recent turns for context window management.
     
+    History kept in a deque(maxlen=max_turns) is already truncated as turns are appended,
+    so it is returned as-is without copying.
+    
     Args:
-        conversation_history (List[Dict]): Full conversation history
+        conversation_history (List[Dict] | Deque[Dict]): Full conversation history
         max_turns (int): Maximum number of turns to keep
         
     Returns:
-        List[Dict]: Truncated conversation history
+        List[Dict] | Deque[Dict]: Truncated conversation history
     """
     if len(conversation_history) <= max_turns:
         return conversation_history
-        
-    # Keep the most recent turns
+    
+    # Keep the most recent turns; deques do not support slicing
+    if isinstance(conversation_history, deque):
+        return list(islice(conversation_history, len(conversation_history) - max_turns, None))
     return conversation_history[-max_turns:]
 
 def format_currency(amount_cents: int) -> str:
@@ -157,9 +375,9 @@ def get_call_duration_str(seconds: int) -> str:
     if seconds < 60:
         return f"{seconds} seconds"
     
-    minutes, seconds = divmod(seconds, 60)
-    if minutes < 60:
-        return f"{minutes} minute{'s' if minutes != 1 else ''}, {seconds} second{'s' if seconds != 1 else ''}"
-    
-    hours, minutes = divmod(minutes, 60)
-    return f"{hours} hour{'s' if hours != 1 else ''}, {minutes} minute{'s' if minutes != 1 else ''}"
\ No newline at end of file
+    # 's'[:n != 1] is "s" unless n is exactly 1
+    hours, rem = divmod(seconds, 3600)
+    minutes, seconds = divmod(rem, 60)
+    if not hours:
+        return f"{minutes} minute{'s'[:minutes != 1]}, {seconds} second{'s'[:seconds != 1]}"
+    return f"{hours} hour{'s'[:hours != 1]}, {minutes} minute{'s'[:minutes != 1]}"
\ No newline at end of file
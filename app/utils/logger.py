@@ -2,24 +2,63 @@ import logging
 import logging.handlers
 import os
 import json
-from datetime import datetime
+import copy
+import queue
+import atexit
 from pythonjsonlogger import jsonlogger
 
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
 from app.config import settings
 
 class CustomJsonFormatter(jsonlogger.JsonFormatter):
     """Custom JSON formatter for structured logging."""
+    def __init__(self, *args, **kwargs):
+        super(CustomJsonFormatter, self).__init__(*args, **kwargs)
+        
+        # Constant per process, so resolve once instead of per record
+        self._service = 'restaurant-voice-agent'
+        self._env = settings.ENVIRONMENT
+    
     def add_fields(self, log_record, record, message_dict):
         super(CustomJsonFormatter, self).add_fields(log_record, record, message_dict)
         
-        # Add timestamp
-        log_record['timestamp'] = datetime.utcnow().isoformat()
+        # Add timestamp as integer epoch nanoseconds, taken from when the record was created
+        # since formatting now happens later on the listener thread
+        log_record['timestamp'] = int(record.created * 1e9)
         log_record['level'] = record.levelname
-        log_record['service'] = 'restaurant-voice-agent'
-        log_record['environment'] = settings.ENVIRONMENT
+        log_record['service'] = self._service
+        log_record['environment'] = self._env
+    
+    def jsonify_log_record(self, log_record):
+        """Serialize the record with orjson when available; it handles datetimes natively."""
+        if orjson is not None:
+            try:
+                return orjson.dumps(log_record, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+            except TypeError:
+                # orjson rejects some values the json module accepts, e.g. integers beyond 64 bits
+                pass
+        return super(CustomJsonFormatter, self).jsonify_log_record(log_record)
+
+class _InProcessQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that leaves formatting, including tracebacks, to the listener's handlers."""
+    def prepare(self, record):
+        # Records never leave the process, so only merge args (capturing mutable values now)
+        # and keep exc_info for the real formatter
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+# Background listener that formats and writes queued records
+_listener = None
 
 def setup_logging():
     """Configure application logging."""
+    global _listener
     log_level = getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO)
     
     # Create logs directory if it doesn't exist
@@ -30,7 +69,10 @@ def setup_logging():
     logger = logging.getLogger()
     logger.setLevel(log_level)
     
-    # Clear existing handlers
+    # Clear existing handlers and stop a listener from a previous setup
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
     logger.handlers = []
     
     # Console handler
@@ -44,28 +86,39 @@ def setup_logging():
     )
     file_handler.setLevel(log_level)
     
-    # Format based on environment
+    # Format based on environment; one formatter instance is shared by both handlers
     if settings.ENVIRONMENT == 'production':
-        # JSON formatter for structured logging in production
+        # JSON formatter for structured logging in production; the format string is
+        # parsed into its required fields once, at construction
         formatter = CustomJsonFormatter('%(timestamp)s %(level)s %(name)s %(message)s')
-        console_handler.setFormatter(formatter)
-        file_handler.setFormatter(formatter)
     else:
         # More readable format for development
         formatter = logging.Formatter(
             '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
         )
-        console_handler.setFormatter(formatter)
-        file_handler.setFormatter(formatter)
+    console_handler.setFormatter(formatter)
+    file_handler.setFormatter(formatter)
     
-    # Add handlers to logger
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    # Log calls only enqueue the record; formatting and disk I/O happen on the listener thread
+    log_queue = queue.Queue(-1)
+    logger.addHandler(_InProcessQueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(
+        log_queue, console_handler, file_handler, respect_handler_level=True
+    )
+    _listener.start()
     
     # Suppress noisy loggers
     logging.getLogger('urllib3').setLevel(logging.WARNING)
     logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
     
-    logger.info(f"Logging setup complete. Level: {settings.LOG_LEVEL}")
+    logger.info("Logging setup complete. Level: %s", settings.LOG_LEVEL)
     
-    return logger
\ No newline at end of file
+    return logger
+
+@atexit.register
+def stop_logging():
+    """Flush queued records and stop the background listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
\ No newline at end of file
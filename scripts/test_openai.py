@@ -5,10 +5,57 @@ A simple script to test OpenAI API connectivity and model availability.
 
 import os
 import sys
+import json
+import time
+import asyncio
+from pathlib import Path
 import openai
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
-def main():
+# Model list cached between runs, refreshed after an hour
+MODELS_CACHE_PATH = Path.home() / ".cache" / "openai_models.json"
+MODELS_CACHE_TTL = 3600
+
+async def _cached_models(client, ttl=MODELS_CACHE_TTL):
+    """List model ids, reusing the on-disk copy while it is fresh."""
+    try:
+        if time.time() - MODELS_CACHE_PATH.stat().st_mtime < ttl:
+            return json.loads(MODELS_CACHE_PATH.read_text())
+    except (OSError, ValueError):
+        pass
+    
+    models = await client.models.list()
+    model_ids = [model.id for model in models.data]
+    try:
+        MODELS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        MODELS_CACHE_PATH.write_text(json.dumps(model_ids))
+    except OSError:
+        pass
+    return model_ids
+
+async def _test_model(client, model_name):
+    """Stream a short completion from a model, returning its first token."""
+    stream = await client.chat.completions.create(
+        model=model_name,
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": "Say hello!"}
+        ],
+        max_tokens=10,
+        stream=True
+    )
+    
+    # The first token proves the model works; stop there instead of waiting for the rest
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                return chunk.choices[0].delta.content
+    finally:
+        await stream.close()
+    return ""
+
+async def main():
     # Load environment variables
     load_dotenv()
     
@@ -23,15 +70,15 @@ def main():
     
     try:
         # Initialize the client
-        client = openai.Client(api_key=api_key)
+        client = AsyncOpenAI(api_key=api_key)
         
         # List available models
         print("\nFetching available models...")
-        models = client.models.list()
+        model_ids = await _cached_models(client)
         
         print("\nAvailable models:")
-        for model in models.data:
-            print(f"- {model.id}")
+        for model_id in model_ids:
+            print(f"- {model_id}")
         
         # Test a simple completion
         test_models = [
@@ -41,22 +88,20 @@ def main():
             "gpt-4-0613"
         ]
         
+        # Query every model concurrently, so the wait is the slowest model rather than the sum
         print("\nTesting chat completions with different models:")
-        for model_name in test_models:
-            try:
-                print(f"\nTesting model: {model_name}")
-                response = client.chat.completions.create(
-                    model=model_name,
-                    messages=[
-                        {"role": "system", "content": "You are a helpful assistant."},
-                        {"role": "user", "content": "Say hello!"}
-                    ],
-                    max_tokens=10
-                )
-                print(f"Response: {response.choices[0].message.content}")
+        results = await asyncio.gather(
+            *[_test_model(client, model_name) for model_name in test_models],
+            return_exceptions=True
+        )
+        
+        for model_name, result in zip(test_models, results):
+            print(f"\nTesting model: {model_name}")
+            if isinstance(result, Exception):
+                print(f"❌ Error with model {model_name}: {str(result)}")
+            else:
+                print(f"First token: {result}")
                 print(f"✅ Model {model_name} works!")
-            except Exception as e:
-                print(f"❌ Error with model {model_name}: {str(e)}")
         
         print("\nTest completed successfully!")
         
@@ -65,4 +110,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file